@@ -0,0 +1,62 @@
+"""denormalized rating aggregates on tools
+
+Revision ID: 002_tool_rating_aggregates
+Revises: 001_initial_robust
+Create Date: 2026-10-15 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002_tool_rating_aggregates'
+down_revision = '001_initial_robust'
+branch_labels = None
+depends_on = None
+
+AGGREGATE_COLUMNS = [
+    'total_ratings',
+    'rating_sum',
+    'rating_count_1',
+    'rating_count_2',
+    'rating_count_3',
+    'rating_count_4',
+    'rating_count_5',
+]
+
+
+def upgrade() -> None:
+    for column in AGGREGATE_COLUMNS:
+        op.add_column('tools', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+    
+    # Backfill from existing ratings
+    conn = op.get_bind()
+    conn.execute(sa.text("""
+        UPDATE tools SET
+            total_ratings = agg.total,
+            rating_sum = agg.sum,
+            rating_count_1 = agg.c1,
+            rating_count_2 = agg.c2,
+            rating_count_3 = agg.c3,
+            rating_count_4 = agg.c4,
+            rating_count_5 = agg.c5
+        FROM (
+            SELECT
+                tool_id,
+                COUNT(*) AS total,
+                SUM(rating) AS sum,
+                COUNT(*) FILTER (WHERE rating = 1) AS c1,
+                COUNT(*) FILTER (WHERE rating = 2) AS c2,
+                COUNT(*) FILTER (WHERE rating = 3) AS c3,
+                COUNT(*) FILTER (WHERE rating = 4) AS c4,
+                COUNT(*) FILTER (WHERE rating = 5) AS c5
+            FROM tool_ratings
+            GROUP BY tool_id
+        ) AS agg
+        WHERE tools.id = agg.tool_id
+    """))
+
+
+def downgrade() -> None:
+    for column in reversed(AGGREGATE_COLUMNS):
+        op.drop_column('tools', column)
@@ -0,0 +1,31 @@
+"""ensure composite unique index on comment_votes (comment_id, user_id)
+
+Revision ID: 003_vote_composite_index
+Revises: 002_tool_rating_aggregates
+Create Date: 2026-10-15 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_vote_composite_index'
+down_revision = '002_tool_rating_aggregates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 001 already creates uix_comment_user_vote and uix_tool_user_rating.
+    # Databases bootstrapped from the models with create_all() never got the
+    # comment_votes one, which vote lookups and upserts rely on.
+    conn = op.get_bind()
+    conn.execute(sa.text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uix_comment_user_vote
+        ON comment_votes (comment_id, user_id)
+    """))
+
+
+def downgrade() -> None:
+    # Owned by 001_initial_robust, nothing to undo
+    pass
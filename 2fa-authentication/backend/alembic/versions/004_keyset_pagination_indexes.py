@@ -0,0 +1,31 @@
+"""indexes for keyset pagination of comments and ratings
+
+Revision ID: 004_keyset_pagination_indexes
+Revises: 003_vote_composite_index
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_keyset_pagination_indexes'
+down_revision = '003_vote_composite_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tool_comments_tool_created', 'tool_comments',
+        ['tool_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+    op.create_index(
+        'ix_tool_ratings_tool_created', 'tool_ratings',
+        ['tool_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tool_ratings_tool_created', table_name='tool_ratings')
+    op.drop_index('ix_tool_comments_tool_created', table_name='tool_comments')
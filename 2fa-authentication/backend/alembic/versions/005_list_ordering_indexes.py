@@ -0,0 +1,42 @@
+"""indexes for newest-first tool and audit log lists
+
+Revision ID: 005_list_ordering_indexes
+Revises: 004_keyset_pagination_indexes
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_list_ordering_indexes'
+down_revision = '004_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_tools_status_created', 'tools',
+        ['status', sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+    op.create_index(
+        'ix_tools_created', 'tools',
+        [sa.text('created_at DESC'), sa.text('id DESC')], unique=False
+    )
+    # Declared on the model but not created by the initial migration
+    op.create_index(
+        op.f('ix_audit_logs_timestamp'), 'audit_logs', ['timestamp'],
+        unique=False, if_not_exists=True
+    )
+    op.create_index(
+        'ix_audit_logs_user_timestamp', 'audit_logs',
+        ['user_id', sa.text('timestamp DESC'), sa.text('id DESC')], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_audit_logs_user_timestamp', table_name='audit_logs')
+    op.drop_index(op.f('ix_audit_logs_timestamp'), table_name='audit_logs', if_exists=True)
+    op.drop_index('ix_tools_created', table_name='tools')
+    op.drop_index('ix_tools_status_created', table_name='tools')
@@ -0,0 +1,35 @@
+"""trigram indexes for tool name/description search
+
+Revision ID: 006_tool_search_trgm_indexes
+Revises: 005_list_ordering_indexes
+Create Date: 2026-10-15 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_tool_search_trgm_indexes'
+down_revision = '005_list_ordering_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    conn.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    
+    op.create_index(
+        'ix_tools_name_trgm', 'tools', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_tools_description_trgm', 'tools', ['description'], unique=False,
+        postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tools_description_trgm', table_name='tools')
+    op.drop_index('ix_tools_name_trgm', table_name='tools')
+    # pg_trgm is left installed, other objects may depend on it
@@ -1,28 +1,70 @@
+from typing import AsyncIterator
+from uuid import uuid4
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.config import get_settings
 
 settings = get_settings()
 
-# Create database engine
+# Create database engine (sync, for scripts such as create_admin.py)
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
     echo=settings.debug
 )
 
-# Create session factory
+# Create session factory (sync)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Connection pool settings. Each uvicorn worker gets its own pool, so the
+# database must accept workers * (db_pool_size + db_max_overflow) connections.
+# Behind PgBouncer (transaction pooling) let the bouncer multiplex instead.
+async_database_url = make_url(settings.database_url).set(drivername="postgresql+asyncpg")
+if settings.db_use_pgbouncer:
+    # Named prepared statements break under transaction pooling: disable both
+    # asyncpg's and SQLAlchemy's statement caches, and give any statement that
+    # is still prepared a unique name so it never collides on a reused server
+    # connection
+    async_database_url = async_database_url.update_query_dict({"prepared_statement_cache_size": "0"})
+    pool_options = {
+        "poolclass": NullPool,
+        "connect_args": {
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        },
+    }
+else:
+    pool_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+# Create async database engine used by the API (asyncpg driver)
+async_engine = create_async_engine(
+    async_database_url,
+    echo=settings.debug,
+    **pool_options
+)
+
+# Create async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
-Base = declarative_base()
+Base = declarative_base(cls=AsyncAttrs)
 
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """Dependency for getting async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
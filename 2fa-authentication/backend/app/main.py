@@ -1,11 +1,12 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import time
 from app.config import get_settings
-from app.database import engine, Base
+from app.database import engine, async_engine, Base
 from app.routers import auth_router, tools_router, admin_router
 from app.routers.ratings_comments import router as ratings_router
+from app.services.audit import audit_service
 
 settings = get_settings()
 
@@ -18,7 +19,8 @@ app = FastAPI(
     description="API with Telegram 2FA, role-based access, and admin panel",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware with specific origins
@@ -49,6 +51,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination of list endpoints
 )
 
 
@@ -65,7 +68,7 @@ async def add_process_time_header(request: Request, call_next):
 # Exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
@@ -74,6 +77,19 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.on_event("startup")
+async def start_audit_writer():
+    """Start the background writer for queued audit entries"""
+    audit_service.start()
+
+
+@app.on_event("shutdown")
+async def dispose_database_engine():
+    """Flush queued audit entries and close pooled database connections"""
+    await audit_service.stop()
+    await async_engine.dispose()
+
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(tools_router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -25,5 +25,10 @@ class AuditLog(Base):
     # Relationships
     user = relationship("User", back_populates="audit_logs")
     
+    # Indexes (a user's activity, newest first)
+    __table_args__ = (
+        Index('ix_audit_logs_user_timestamp', 'user_id', timestamp.desc(), id.desc()),
+    )
+    
     def __repr__(self):
         return f"<AuditLog(user_id={self.user_id}, action='{self.action}', entity_type='{self.entity_type}')>"
\ No newline at end of file
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Dict, Optional
 import enum
 
 from app.database import Base
@@ -51,6 +52,15 @@ class Tool(Base):
     approved_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
     rejection_reason = Column(Text, nullable=True)
     
+    # Rating aggregates, maintained incrementally by ToolRating events
+    total_ratings = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_count_1 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_count_2 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_count_3 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_count_4 = Column(Integer, default=0, server_default="0", nullable=False)
+    rating_count_5 = Column(Integer, default=0, server_default="0", nullable=False)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -58,8 +68,48 @@ class Tool(Base):
     # Relationships
     creator = relationship("User", back_populates="tools", foreign_keys=[created_by])
     approver = relationship("User", back_populates="approved_tools", foreign_keys=[approved_by])
-    ratings = relationship("ToolRating", back_populates="tool", cascade="all, delete-orphan")
+    # Ratings go with the tool through the FK's ON DELETE CASCADE instead of
+    # being loaded and deleted (with an aggregate UPDATE each) one by one
+    ratings = relationship(
+        "ToolRating", back_populates="tool", cascade="all, delete-orphan", passive_deletes=True
+    )
     comments = relationship("ToolComment", back_populates="tool", cascade="all, delete-orphan")
     
+    # Indexes (newest-first lists, optionally filtered by status; trigram
+    # GIN indexes serve the unanchored ILIKE '%...%' search, needs pg_trgm)
+    __table_args__ = (
+        Index('ix_tools_status_created', 'status', created_at.desc(), id.desc()),
+        Index('ix_tools_created', created_at.desc(), id.desc()),
+        Index(
+            'ix_tools_name_trgm', 'name',
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+        ),
+        Index(
+            'ix_tools_description_trgm', 'description',
+            postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}
+        ),
+    )
+    
+    @property
+    def average_rating(self) -> Optional[float]:
+        """Average star rating, or None if the tool has not been rated"""
+        if not self.total_ratings:
+            return None
+        return round(self.rating_sum / self.total_ratings, 2)
+    
+    @property
+    def rating_distribution(self) -> Dict[str, int]:
+        """Number of ratings per star value (keys "1".."5")"""
+        return {str(star): getattr(self, f"rating_count_{star}") or 0 for star in range(1, 6)}
+    
     def __repr__(self):
-        return f"<Tool(name='{self.name}', category='{self.category}', status='{self.status}')>"
\ No newline at end of file
+        return f"<Tool(name='{self.name}', category='{self.category}', status='{self.status}')>"
+
+
+# Columns behind ToolResponse, for load_only() on list queries; add
+# RATING_AGGREGATE_COLUMNS when average_rating/total_ratings are returned
+TOOL_RESPONSE_COLUMNS = (
+    Tool.id, Tool.name, Tool.description, Tool.category, Tool.status, Tool.url,
+    Tool.created_by, Tool.approved_by, Tool.rejection_reason, Tool.created_at, Tool.updated_at
+)
+RATING_AGGREGATE_COLUMNS = (Tool.total_ratings, Tool.rating_sum)
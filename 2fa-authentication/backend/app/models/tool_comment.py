@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -22,6 +22,16 @@ class ToolComment(Base):
     user = relationship("User", back_populates="comments")
     votes = relationship("CommentVote", back_populates="comment", cascade="all, delete-orphan")
     
+    # Indexes (keyset pagination: newest comments of a tool first)
+    __table_args__ = (
+        Index('ix_tool_comments_tool_created', 'tool_id', created_at.desc(), id.desc()),
+    )
+    
+    @property
+    def username(self) -> str:
+        """Author's username (load `user` eagerly when listing comments)"""
+        return self.user.username if self.user else "Unknown"
+    
     def __repr__(self):
         return f"<ToolComment(id={self.id}, tool_id={self.tool_id}, user_id={self.user_id})>"
 
@@ -31,7 +41,7 @@ class CommentVote(Base):
     __tablename__ = "comment_votes"
     
     id = Column(Integer, primary_key=True, index=True)
-    comment_id = Column(Integer, ForeignKey("tool_comments.id"), nullable=False, index=True)
+    comment_id = Column(Integer, ForeignKey("tool_comments.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     vote_type = Column(String(10), nullable=False)  # 'upvote' or 'downvote'
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -40,5 +50,10 @@ class CommentVote(Base):
     comment = relationship("ToolComment", back_populates="votes")
     user = relationship("User", back_populates="comment_votes")
     
+    # Constraints (one vote per user per comment; also serves (comment_id, user_id) lookups)
+    __table_args__ = (
+        UniqueConstraint('comment_id', 'user_id', name='uix_comment_user_vote'),
+    )
+    
     def __repr__(self):
         return f"<CommentVote(comment_id={self.comment_id}, user_id={self.user_id}, type={self.vote_type})>"
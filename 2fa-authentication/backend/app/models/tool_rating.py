@@ -1,7 +1,11 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint, CheckConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint, CheckConstraint, Index, event, inspect, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.expression import Update
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import Optional
 from app.database import Base
+from app.models.tool import Tool
 
 
 class ToolRating(Base):
@@ -9,7 +13,7 @@ class ToolRating(Base):
     __tablename__ = "tool_ratings"
     
     id = Column(Integer, primary_key=True, index=True)
-    tool_id = Column(Integer, ForeignKey("tools.id"), nullable=False, index=True)
+    tool_id = Column(Integer, ForeignKey("tools.id", ondelete="CASCADE"), nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     rating = Column(Integer, nullable=False)  # 1-5 stars
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -21,9 +25,72 @@ class ToolRating(Base):
     
     # Constraints
     __table_args__ = (
-        UniqueConstraint('tool_id', 'user_id', name='unique_user_tool_rating'),
+        UniqueConstraint('tool_id', 'user_id', name='uix_tool_user_rating'),
         CheckConstraint('rating >= 1 AND rating <= 5', name='valid_rating'),
+        Index('ix_tool_ratings_tool_created', 'tool_id', created_at.desc(), id.desc()),
     )
     
     def __repr__(self):
         return f"<ToolRating(tool_id={self.tool_id}, user_id={self.user_id}, rating={self.rating})>"
+
+
+def rating_aggregate_update(
+    tool_id: int,
+    old_rating: Optional[int] = None,
+    new_rating: Optional[int] = None
+) -> Optional[Update]:
+    """
+    Build the UPDATE applying a single rating change to the aggregates on Tool
+    
+    Args:
+        tool_id: Rated tool
+        old_rating: Previous star value (None for a new rating)
+        new_rating: New star value (None for a removed rating)
+        
+    Returns:
+        Update statement, or None if nothing changed
+    """
+    if old_rating == new_rating:
+        return None
+    
+    # Plain ints: Python bools would bind as BOOLEAN, and integer + boolean
+    # is an error in Postgres. updated_at is set to itself so rating activity
+    # does not trigger its onupdate and touch the tool's modification time.
+    values = {
+        "total_ratings": Tool.total_ratings + int(new_rating is not None) - int(old_rating is not None),
+        "rating_sum": Tool.rating_sum + (new_rating or 0) - (old_rating or 0),
+        "updated_at": Tool.updated_at,
+    }
+    if old_rating is not None:
+        column = getattr(Tool, f"rating_count_{old_rating}")
+        values[column.key] = column - 1
+    if new_rating is not None:
+        column = getattr(Tool, f"rating_count_{new_rating}")
+        values[column.key] = column + 1
+    
+    return update(Tool.__table__).where(Tool.id == tool_id).values(values)
+
+
+def _apply_rating_delta(connection: Connection, tool_id: int, old_rating=None, new_rating=None) -> None:
+    stmt = rating_aggregate_update(tool_id, old_rating, new_rating)
+    if stmt is not None:
+        connection.execute(stmt)
+
+
+# ORM flushes keep the aggregates in sync automatically. Core INSERT/DELETE
+# statements bypass these events and must execute rating_aggregate_update().
+@event.listens_for(ToolRating, "after_insert")
+def _rating_inserted(mapper, connection, target):
+    _apply_rating_delta(connection, target.tool_id, new_rating=target.rating)
+
+
+@event.listens_for(ToolRating, "after_update")
+def _rating_updated(mapper, connection, target):
+    history = inspect(target).attrs.rating.history
+    if history.deleted:
+        _apply_rating_delta(connection, target.tool_id, history.deleted[0], target.rating)
+
+
+@event.listens_for(ToolRating, "after_delete")
+def _rating_deleted(mapper, connection, target):
+    _apply_rating_delta(connection, target.tool_id, old_rating=target.rating)
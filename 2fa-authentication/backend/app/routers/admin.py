@@ -1,63 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import func, select
+from sqlalchemy.orm import load_only, raiseload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
 from app.models.user import User, UserRole
-from app.models.tool import Tool, ToolStatus, ToolCategory
+from app.models.tool import Tool, ToolStatus, ToolCategory, TOOL_RESPONSE_COLUMNS
 from app.models.audit_log import AuditLog
 from app.schemas.tool import ToolResponse, ToolApproval
 from app.schemas.user import UserResponse
 from app.utils.security import get_current_user
+from app.utils.pagination import paginate, next_cursor
+from app.utils.aggregates import count_by
 from app.middleware.auth import require_moderator, require_admin
-from app.services.cache import cache_service
+from app.services.cache import cache_service, tool_list_tags, TOOL_STATS_KEYS
 from app.services.audit import audit_service
 
 router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
 
+async def _count(db: AsyncSession, model, *criteria) -> int:
+    """Count rows of a model matching the given criteria"""
+    return await db.scalar(select(func.count()).select_from(model).where(*criteria))
+
+
 @router.get("/tools", response_model=List[ToolResponse])
 async def get_all_tools_admin(
+    response: Response,
     category: Optional[ToolCategory] = None,
     status_filter: Optional[ToolStatus] = Query(None, alias="status"),
     created_by: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     user: User = Depends(require_moderator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get all tools with filters (moderator/admin only)
     Supports filtering by category, status, and creator
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page instead of using `skip`.
     """
     
     # Build query
-    query = db.query(Tool)
+    query = select(Tool)
     
     if category:
-        query = query.filter(Tool.category == category)
+        query = query.where(Tool.category == category)
     
     if status_filter:
-        query = query.filter(Tool.status == status_filter)
+        query = query.where(Tool.status == status_filter)
     
     if created_by:
-        query = query.filter(Tool.created_by == created_by)
+        query = query.where(Tool.created_by == created_by)
     
-    tools = query.order_by(Tool.created_at.desc()).offset(skip).limit(limit).all()
+    tools = (await db.scalars(paginate(
+        query, Tool.created_at, Tool.id, cursor, skip, limit, deferred_join=True
+    ).options(load_only(*TOOL_RESPONSE_COLUMNS), raiseload("*")))).all()
+    
+    cursor_after = next_cursor(tools, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     
     return tools
 
 
 @router.get("/tools/pending", response_model=List[ToolResponse])
 async def get_pending_tools(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
     user: User = Depends(require_moderator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all pending tools awaiting approval (moderator/admin only)"""
+    """
+    Get pending tools awaiting approval, newest first (moderator/admin only)
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page instead of using `skip`.
+    """
+    
+    # Served by ix_tools_status_created: an index scan bounded by the LIMIT
+    query = select(Tool)\
+        .options(load_only(*TOOL_RESPONSE_COLUMNS), raiseload("*"))\
+        .where(Tool.status == ToolStatus.PENDING)
     
-    tools = db.query(Tool)\
-        .filter(Tool.status == ToolStatus.PENDING)\
-        .order_by(Tool.created_at.desc())\
-        .all()
+    tools = (await db.scalars(paginate(query, Tool.created_at, Tool.id, cursor, skip, limit))).all()
+    
+    cursor_after = next_cursor(tools, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     
     return tools
 
@@ -67,18 +100,20 @@ async def approve_tool(
     tool_id: int,
     approval: ToolApproval,
     user: User = Depends(require_moderator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Approve or reject a tool (moderator/admin only)"""
     
     # Find tool
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
+    tool = await db.get(Tool, tool_id)
     if not tool:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tool not found"
         )
     
+    previous_filter = (tool.category.value, tool.status.value)
+    
     # Update status
     if approval.approved:
         tool.status = ToolStatus.APPROVED
@@ -91,15 +126,17 @@ async def approve_tool(
     
     tool.approved_by = user.id
     
-    db.commit()
-    db.refresh(tool)
+    await db.commit()
+    await db.refresh(tool)
     
-    # Clear cache
-    cache_service.clear_pattern("tools:*")
+    # Clear cache of the lists the tool left and joined
+    cache_service.invalidate_many(
+        TOOL_STATS_KEYS,
+        tags=tool_list_tags(previous_filter, (tool.category.value, tool.status.value))
+    )
     
     # Log approval/rejection
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action=action,
         entity_type="tool",
@@ -115,20 +152,34 @@ async def approve_tool(
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
+    response: Response,
     role: Optional[UserRole] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all users with optional role filter (admin only)"""
+    """
+    Get all users with optional role filter (admin only)
+    Newest users first; pass the X-Next-Cursor header of the previous page as
+    `cursor` to seek directly to the next page instead of using `skip`.
+    """
     
-    query = db.query(User)
+    # Only the UserResponse columns (skips password hash and Telegram id)
+    query = select(User).options(
+        load_only(User.id, User.username, User.email, User.role, User.is_2fa_enabled, User.created_at),
+        raiseload("*")
+    )
     
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
     
-    users = query.offset(skip).limit(limit).all()
+    users = (await db.scalars(paginate(query, User.created_at, User.id, cursor, skip, limit))).all()
+    
+    cursor_after = next_cursor(users, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     
     return users
 
@@ -138,11 +189,11 @@ async def update_user_role(
     user_id: int,
     new_role: UserRole,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user role (admin only)"""
     
-    target_user = db.query(User).filter(User.id == user_id).first()
+    target_user = await db.get(User, user_id)
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,12 +210,14 @@ async def update_user_role(
     old_role = target_user.role
     target_user.role = new_role
     
-    db.commit()
-    db.refresh(target_user)
+    await db.commit()
+    await db.refresh(target_user)
+    
+    # Role counts changed
+    cache_service.invalidate_many(["admin:stats:overview", "admin:statistics"])
     
     # Log role change
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=current_user,
         action="change_role",
         entity_type="user",
@@ -180,28 +233,40 @@ async def update_user_role(
 
 @router.get("/audit-logs")
 async def get_audit_logs(
+    response: Response,
     user_id: Optional[int] = None,
     action: Optional[str] = None,
     entity_type: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get audit logs with filters (admin only)"""
+    """
+    Get audit logs with filters (admin only)
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page instead of using `skip`.
+    """
     
-    query = db.query(AuditLog)
+    query = select(AuditLog)
     
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        query = query.where(AuditLog.user_id == user_id)
     
     if action:
-        query = query.filter(AuditLog.action == action)
+        query = query.where(AuditLog.action == action)
     
     if entity_type:
-        query = query.filter(AuditLog.entity_type == entity_type)
+        query = query.where(AuditLog.entity_type == entity_type)
     
-    logs = query.order_by(AuditLog.timestamp.desc()).offset(skip).limit(limit).all()
+    logs = (await db.scalars(paginate(
+        query, AuditLog.timestamp, AuditLog.id, cursor, skip, limit, deferred_join=True
+    ).options(raiseload("*")))).all()
+    
+    cursor_after = next_cursor(logs, limit, timestamp_attr="timestamp")
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     
     return logs
 
@@ -209,7 +274,7 @@ async def get_audit_logs(
 @router.get("/stats/overview")
 async def get_admin_stats(
     user: User = Depends(require_moderator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get comprehensive statistics (moderator/admin only)"""
     
@@ -220,39 +285,39 @@ async def get_admin_stats(
     if cached_stats:
         return cached_stats
     
-    # Calculate stats
+    # Calculate stats: one pass over each table with filtered counts
+    users = (await db.execute(select(
+        func.count().label("total"),
+        *[func.count().filter(User.role == role).label(role.value) for role in UserRole],
+        func.count().filter(User.is_2fa_enabled == True).label("with_2fa")
+    ))).one()._mapping
+    tools = (await db.execute(select(
+        func.count().label("total"),
+        *[func.count().filter(Tool.status == tool_status).label(tool_status.value) for tool_status in ToolStatus]
+    ))).one()._mapping
+    tools_by_category = await count_by(db, Tool.category, ToolCategory)
+    total_actions = await _count(db, AuditLog)
+    
     stats = {
         "users": {
-            "total": db.query(User).count(),
-            "by_role": {
-                "user": db.query(User).filter(User.role == UserRole.USER).count(),
-                "moderator": db.query(User).filter(User.role == UserRole.MODERATOR).count(),
-                "admin": db.query(User).filter(User.role == UserRole.ADMIN).count(),
-            },
-            "with_2fa": db.query(User).filter(User.is_2fa_enabled == True).count()
+            "total": users["total"],
+            "by_role": {role.value: users[role.value] for role in UserRole},
+            "with_2fa": users["with_2fa"]
         },
         "tools": {
-            "total": db.query(Tool).count(),
-            "by_status": {
-                "pending": db.query(Tool).filter(Tool.status == ToolStatus.PENDING).count(),
-                "approved": db.query(Tool).filter(Tool.status == ToolStatus.APPROVED).count(),
-                "rejected": db.query(Tool).filter(Tool.status == ToolStatus.REJECTED).count(),
-            },
-            "by_category": {}
+            "total": tools["total"],
+            "by_status": {tool_status.value: tools[tool_status.value] for tool_status in ToolStatus},
+            "by_category": tools_by_category
         },
         "activity": {
-            "total_actions": db.query(AuditLog).count(),
-            "recent_actions": db.query(AuditLog).order_by(AuditLog.timestamp.desc()).limit(10).count()
+            "total_actions": total_actions,
+            # Size of the 10 most recent actions window
+            "recent_actions": min(total_actions, 10)
         }
     }
     
-    # Count by category
-    for category in ToolCategory:
-        count = db.query(Tool).filter(Tool.category == category).count()
-        stats["tools"]["by_category"][category.value] = count
-    
-    # Cache for 5 minutes
-    cache_service.set(cache_key, stats, expire=300)
+    # Cache for 1 minute
+    cache_service.set(cache_key, stats, expire=60)
 
     return stats
 
@@ -260,27 +325,35 @@ async def get_admin_stats(
 @router.get("/statistics")
 async def get_statistics(
     user: User = Depends(require_moderator),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get statistics for admin panel"""
+    
+    # Try cache first
+    cache_key = "admin:statistics"
+    cached_stats = cache_service.get(cache_key)
+    
+    if cached_stats:
+        return cached_stats
+    
+    users_by_role = await count_by(db, User.role, UserRole)
+    tools_by_status = await count_by(db, Tool.status, ToolStatus)
+    tools_by_category = await count_by(db, Tool.category, ToolCategory)
+    
     stats = {
         "users_by_role": [
-            {"role": "user", "count": db.query(User).filter(User.role == UserRole.USER).count()},
-            {"role": "moderator", "count": db.query(User).filter(User.role == UserRole.MODERATOR).count()},
-            {"role": "admin", "count": db.query(User).filter(User.role == UserRole.ADMIN).count()},
+            {"role": role, "count": count} for role, count in users_by_role.items()
         ],
         "tools_by_status": [
-            {"status": "pending", "count": db.query(Tool).filter(Tool.status == ToolStatus.PENDING).count()},
-            {"status": "approved", "count": db.query(Tool).filter(Tool.status == ToolStatus.APPROVED).count()},
-            {"status": "rejected", "count": db.query(Tool).filter(Tool.status == ToolStatus.REJECTED).count()},
+            {"status": tool_status, "count": count} for tool_status, count in tools_by_status.items()
+        ],
+        "tools_by_category": [
+            {"category": category, "count": count} for category, count in tools_by_category.items()
         ],
-        "tools_by_category": [],
         "recent_activity": []
     }
     
-    for category in ToolCategory:
-        count = db.query(Tool).filter(Tool.category == category).count()
-        stats["tools_by_category"].append({"category": category.value, "count": count})
-    
+    # Cache for 1 minute
+    cache_service.set(cache_key, stats, expire=60)
     
     return stats
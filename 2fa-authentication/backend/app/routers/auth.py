@@ -1,5 +1,8 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from app.database import get_db
 from app.models.user import User
@@ -15,39 +18,39 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     
-    # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
-    if existing_user:
+    # Check username and email in one query
+    existing = (await db.execute(
+        select(User.username, User.email).where(
+            or_(User.username == user_data.username, User.email == user_data.email)
+        )
+    )).all()
+    if any(row.username == user_data.username for row in existing):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
-    
-    # Check if email already exists
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
-    if existing_email:
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
+    # Create new user (bcrypt runs in a worker thread, off the event loop)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
-        hashed_password=hash_password(user_data.password)
+        hashed_password=await run_in_threadpool(hash_password, user_data.password)
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     # Log registration
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=new_user,
         action="register",
         entity_type="user",
@@ -58,12 +61,12 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login with username and password"""
     
     # Find user
-    user = db.query(User).filter(User.username == credentials.username).first()
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.username == credentials.username))
+    if not user or not await run_in_threadpool(verify_password, credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -74,13 +77,16 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
         # Generate and send 2FA code
         code = telegram_service.generate_code()
         
-        # Store code in cache (expires in 5 minutes)
+        # Store code in cache (expires in 5 minutes) while sending it via
+        # Telegram; the two calls are independent
         cache_key = f"2fa:{user.id}"
-        cache_service.set(cache_key, code, expire=300)
-        
-        # Send code via Telegram
-        success = await telegram_service.send_code(user.telegram_id, code)
+        _, success = await asyncio.gather(
+            run_in_threadpool(cache_service.set, cache_key, code, 300),
+            telegram_service.send_code(user.telegram_id, code)
+        )
         if not success:
+            # The code never reached the user, don't leave it usable
+            cache_service.delete(cache_key)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to send 2FA code"
@@ -98,8 +104,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     access_token = create_access_token(data={"sub": user.username})
     
     # Log login
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="login",
         entity_type="user",
@@ -113,7 +118,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
 async def verify_2fa(
     verification: TwoFactorVerify,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify 2FA code and get final access token"""
     
@@ -141,8 +146,7 @@ async def verify_2fa(
     access_token = create_access_token(data={"sub": user.username})
     
     # Log successful 2FA
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="2fa_verified",
         entity_type="user",
@@ -156,7 +160,7 @@ async def verify_2fa(
 async def setup_telegram(
     telegram_data: TelegramSetup,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Setup Telegram 2FA for current user"""
     
@@ -172,12 +176,11 @@ async def setup_telegram(
     user.telegram_id = telegram_data.telegram_chat_id
     user.is_2fa_enabled = True
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Log setup
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="setup_2fa",
         entity_type="user",
@@ -191,18 +194,17 @@ async def setup_telegram(
 @router.post("/disable-2fa", response_model=UserResponse)
 async def disable_2fa(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Disable 2FA for current user"""
     
     user.is_2fa_enabled = False
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     # Log disable
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="disable_2fa",
         entity_type="user",
@@ -221,7 +223,7 @@ async def get_current_user_info(user: User = Depends(get_current_user)):
 async def change_password(
     password_data: dict,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Change user password"""
     current_password = password_data.get("current_password")
@@ -234,14 +236,14 @@ async def change_password(
         )
     
     # Verify current password
-    if not verify_password(current_password, user.hashed_password):
+    if not await run_in_threadpool(verify_password, current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    user.hashed_password = hash_password(new_password)
-    db.commit()
+    user.hashed_password = await run_in_threadpool(hash_password, new_password)
+    await db.commit()
     
     return {"message": "Password changed successfully"}
\ No newline at end of file
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from typing import List, Optional
+import orjson
 from app.database import get_db
 from app.models.user import User
 from app.models.tool import Tool
-from app.models.tool_rating import ToolRating
+from app.models.tool_rating import ToolRating, rating_aggregate_update
 from app.models.tool_comment import ToolComment, CommentVote
 from app.schemas.rating_comment import (
     RatingCreate, RatingResponse, RatingStats,
@@ -13,12 +18,21 @@ from app.schemas.rating_comment import (
     CommentVoteCreate
 )
 from app.utils.security import get_current_user
-from app.services.cache import cache_service
+from app.utils.pagination import paginate, next_cursor
+from app.services.cache import cache_service, tool_list_tags
 from app.services.audit import audit_service
 from app.middleware.auth import require_moderator
 
 router = APIRouter(prefix="/api/tools", tags=["Ratings & Comments"])
 
+USER_RATING_STMT = select(ToolRating.rating).where(
+    ToolRating.tool_id == bindparam("tool_id"),
+    ToolRating.user_id == bindparam("user_id")
+)
+COMMENT_COUNT_STMT = select(func.count(ToolComment.id)).where(
+    ToolComment.tool_id == bindparam("tool_id")
+)
+
 
 # ===== RATINGS =====
 
@@ -27,51 +41,68 @@ async def rate_tool(
     tool_id: int,
     rating_data: RatingCreate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Rate a tool (1-5 stars). Users can update their existing rating."""
     
-    # Check if tool exists
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
-    if not tool:
-        raise HTTPException(status_code=404, detail="Tool not found")
+    rating_columns = (
+        ToolRating.id, ToolRating.tool_id, ToolRating.user_id, ToolRating.rating,
+        ToolRating.created_at, ToolRating.updated_at
+    )
     
-    # Check if user already rated this tool
-    existing_rating = db.query(ToolRating).filter(
-        ToolRating.tool_id == tool_id,
-        ToolRating.user_id == user.id
-    ).first()
-    
-    if existing_rating:
-        # Update existing rating
-        existing_rating.rating = rating_data.rating
-        db.commit()
-        db.refresh(existing_rating)
-        rating = existing_rating
-        action = "update_rating"
-    else:
-        # Create new rating
-        rating = ToolRating(
-            tool_id=tool_id,
-            user_id=user.id,
-            rating=rating_data.rating
+    # Lock the user's existing rating before writing, so concurrent requests
+    # from the same user serialize and each sees the previous value it replaces.
+    # A missing row cannot be locked: insert with DO NOTHING and, if another
+    # request inserted first (its transaction has committed by then), retry.
+    for _ in range(3):
+        previous_rating = await db.scalar(
+            USER_RATING_STMT.with_for_update(),
+            {"tool_id": tool_id, "user_id": user.id}
         )
-        db.add(rating)
-        db.commit()
-        db.refresh(rating)
-        action = "create_rating"
+        
+        if previous_rating is None:
+            stmt = insert(ToolRating)\
+                .values(tool_id=tool_id, user_id=user.id, rating=rating_data.rating)\
+                .on_conflict_do_nothing(index_elements=[ToolRating.tool_id, ToolRating.user_id])
+        else:
+            stmt = update(ToolRating)\
+                .where(ToolRating.tool_id == tool_id, ToolRating.user_id == user.id)\
+                .values(rating=rating_data.rating, updated_at=datetime.utcnow())
+        
+        try:
+            row = (await db.execute(stmt.returning(*rating_columns))).mappings().first()
+        except IntegrityError:
+            # Foreign key violation: the tool does not exist
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Tool not found")
+        
+        if row is not None:
+            rating = dict(row)
+            break
+    else:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Rating was modified concurrently, please retry")
+    
+    # Core statements bypass the ORM rating events, update aggregates here;
+    # the tool's filter values tell which cached lists show the new average
+    list_tags = []
+    aggregate_update = rating_aggregate_update(tool_id, previous_rating, rating_data.rating)
+    if aggregate_update is not None:
+        tool = (await db.execute(aggregate_update.returning(Tool.category, Tool.status))).one()
+        list_tags = tool_list_tags((tool.category.value, tool.status.value))
+    await db.commit()
+    
+    action = "create_rating" if previous_rating is None else "update_rating"
     
     # Clear rating cache
-    cache_service.delete(f"rating:stats:{tool_id}")
-    cache_service.clear_pattern("tools:*")
+    cache_service.invalidate_many([f"rating:stats:{tool_id}"], tags=list_tags)
     
     # Log action
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action=action,
         entity_type="tool_rating",
-        entity_id=rating.id,
+        entity_id=rating["id"],
         details={"tool_id": tool_id, "rating": rating_data.rating}
     )
     
@@ -82,75 +113,74 @@ async def rate_tool(
 async def get_my_rating(
     tool_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get current user's rating for a tool"""
     
-    rating = db.query(ToolRating).filter(
-        ToolRating.tool_id == tool_id,
-        ToolRating.user_id == user.id
-    ).first()
+    rating = await db.scalar(USER_RATING_STMT, {"tool_id": tool_id, "user_id": user.id})
     
-    if rating:
-        return {"rating": rating.rating}
-    else:
-        return {"rating": None}
+    return {"rating": rating}
 
 
 @router.get("/{tool_id}/ratings/stats", response_model=RatingStats)
-async def get_rating_stats(tool_id: int, db: Session = Depends(get_db)):
+async def get_rating_stats(tool_id: int, db: AsyncSession = Depends(get_db)):
     """Get rating statistics for a tool"""
     
     # Try cache first
     cache_key = f"rating:stats:{tool_id}"
-    cached = cache_service.get(cache_key)
+    cached = cache_service.get_raw(cache_key, local=True)
     if cached:
-        return cached
+        return Response(content=cached, media_type="application/json")
     
-    # Calculate stats
-    ratings = db.query(ToolRating).filter(ToolRating.tool_id == tool_id).all()
+    # Aggregates are kept up to date on the tool row, no ratings scan needed
+    tool = await db.get(Tool, tool_id)
     
-    if not ratings:
+    if not tool:
         stats = {
             "average_rating": 0.0,
             "total_ratings": 0,
             "rating_distribution": {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
         }
     else:
-        total = len(ratings)
-        avg = sum(r.rating for r in ratings) / total
-        
-        distribution = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
-        for r in ratings:
-            distribution[str(r.rating)] += 1
-        
         stats = {
-            "average_rating": round(avg, 2),
-            "total_ratings": total,
-            "rating_distribution": distribution
+            "average_rating": tool.average_rating or 0.0,
+            "total_ratings": tool.total_ratings,
+            "rating_distribution": tool.rating_distribution
         }
     
-    # Cache for 5 minutes
-    cache_service.set(cache_key, stats, expire=300)
+    # Cache the serialized body for 5 minutes
+    body = orjson.dumps(stats)
+    cache_service.set_raw(cache_key, body, expire=300, local=True)
     
-    return stats
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{tool_id}/ratings", response_model=List[RatingResponse])
 async def get_tool_ratings(
     tool_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all ratings for a tool"""
+    """
+    Get all ratings for a tool
+    
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page instead of using `skip`.
+    """
     
-    ratings = db.query(ToolRating)\
-        .filter(ToolRating.tool_id == tool_id)\
-        .order_by(ToolRating.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
+    query = paginate(
+        select(ToolRating).options(raiseload("*")).where(ToolRating.tool_id == tool_id),
+        ToolRating.created_at, ToolRating.id, cursor, skip, limit
+    )
+    
+    ratings = (await db.scalars(query)).all()
+    
+    cursor_after = next_cursor(ratings, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     
     return ratings
 
@@ -159,28 +189,33 @@ async def get_tool_ratings(
 async def delete_rating(
     tool_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete your rating for a tool"""
     
-    rating = db.query(ToolRating).filter(
-        ToolRating.tool_id == tool_id,
-        ToolRating.user_id == user.id
-    ).first()
+    rating = (await db.execute(
+        delete(ToolRating)
+        .where(ToolRating.tool_id == tool_id, ToolRating.user_id == user.id)
+        .returning(ToolRating.id, ToolRating.rating)
+    )).first()
     
     if not rating:
         raise HTTPException(status_code=404, detail="Rating not found")
     
-    db.delete(rating)
-    db.commit()
+    # Core statements bypass the ORM rating events, update aggregates here
+    tool = (await db.execute(
+        rating_aggregate_update(tool_id, old_rating=rating.rating).returning(Tool.category, Tool.status)
+    )).one()
+    await db.commit()
     
     # Clear cache
-    cache_service.delete(f"rating:stats:{tool_id}")
-    cache_service.clear_pattern("tools:*")
+    cache_service.invalidate_many(
+        [f"rating:stats:{tool_id}"],
+        tags=tool_list_tags((tool.category.value, tool.status.value))
+    )
     
     # Log action
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="delete_rating",
         entity_type="tool_rating",
@@ -198,12 +233,12 @@ async def create_comment(
     tool_id: int,
     comment_data: CommentCreate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a comment on a tool"""
     
     # Check if tool exists
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
+    tool = await db.get(Tool, tool_id)
     if not tool:
         raise HTTPException(status_code=404, detail="Tool not found")
     
@@ -215,15 +250,14 @@ async def create_comment(
     )
     
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    await db.commit()
+    await db.refresh(comment)
     
     # Clear cache
-    cache_service.clear_pattern(f"comments:{tool_id}:*")
+    cache_service.invalidate_tag(f"comments:{tool_id}")
     
     # Log action
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="create_comment",
         entity_type="tool_comment",
@@ -250,41 +284,41 @@ async def get_tool_comments(
     tool_id: int,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all comments for a tool"""
-    
-    
-    
-    comments = db.query(ToolComment)\
-        .filter(ToolComment.tool_id == tool_id)\
-        .order_by(ToolComment.created_at.desc())\
-        .offset(skip)\
-        .limit(limit)\
-        .all()
-    
-    # Add username to each comment
-    result = []
-    for comment in comments:
-        comment_dict = {
-    "id": comment.id,
-    "tool_id": comment.tool_id,
-    "user_id": comment.user_id,
-    "content": comment.content,
-    "username": comment.user.username if comment.user else "Unknown",
-    "upvotes": comment.upvotes,
-    "downvotes": comment.downvotes,
-    "user_vote": None,
-    "created_at": comment.created_at,
-    "updated_at": comment.updated_at
-}
-        comment_dict['username'] = comment.user.username
-        result.append(comment_dict)
-    
-   
-    
-    total = db.query(ToolComment).filter(ToolComment.tool_id == tool_id).count()
-    return {"comments": result, "total": total}
+    """
+    Get all comments for a tool (cached as serialized JSON)
+    
+    Pass the `next_cursor` of the previous page as `cursor` to seek directly
+    to the next page instead of using `skip`.
+    """
+    
+    page = f"after-{cursor}" if cursor else skip
+    cache_key = f"comments:{tool_id}:{page}:{limit}"
+    # The first page takes most of the reads, keep it in process memory too
+    first_page = not cursor and skip == 0
+    cached = cache_service.get_raw(cache_key, local=first_page)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+    
+    # Authors are fetched in one batched SELECT instead of one per comment
+    query = paginate(
+        select(ToolComment)
+        .options(selectinload(ToolComment.user), raiseload("*"))
+        .where(ToolComment.tool_id == tool_id),
+        ToolComment.created_at, ToolComment.id, cursor, skip, limit
+    )
+    
+    comments = (await db.scalars(query)).all()
+    
+    result = [CommentResponse.model_validate(comment).model_dump() for comment in comments]
+    
+    total = await db.scalar(COMMENT_COUNT_STMT, {"tool_id": tool_id})
+    
+    body = orjson.dumps({"comments": result, "total": total, "next_cursor": next_cursor(comments, limit)})
+    cache_service.set_raw(cache_key, body, expire=300, local=first_page, tags=[f"comments:{tool_id}"])
+    return Response(content=body, media_type="application/json")
 
 
 @router.put("/{tool_id}/comments/{comment_id}", response_model=CommentResponse)
@@ -293,16 +327,13 @@ async def update_comment(
     comment_id: int,
     comment_data: CommentUpdate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update your comment"""
     
-    comment = db.query(ToolComment).filter(
-        ToolComment.id == comment_id,
-        ToolComment.tool_id == tool_id
-    ).first()
+    comment = await db.get(ToolComment, comment_id)
     
-    if not comment:
+    if not comment or comment.tool_id != tool_id:
         raise HTTPException(status_code=404, detail="Comment not found")
     
     # Check ownership
@@ -310,16 +341,16 @@ async def update_comment(
         raise HTTPException(status_code=403, detail="Not authorized to edit this comment")
     
     # Update
-    comment.comment = comment_data.comment
-    db.commit()
-    db.refresh(comment)
+    comment.content = comment_data.content
+    await db.commit()
+    await db.refresh(comment)
+    await comment.awaitable_attrs.user
     
     # Clear cache
-    cache_service.clear_pattern(f"comments:{tool_id}:*")
+    cache_service.invalidate_tag(f"comments:{tool_id}")
     
     # Log action
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="update_comment",
         entity_type="tool_comment",
@@ -335,32 +366,40 @@ async def delete_comment(
     tool_id: int,
     comment_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a comment (own comment or moderator)"""
     
-    comment = db.query(ToolComment).filter(
+    # Delete in one statement; non-moderators can only match their own comment
+    from app.models.user import UserRole
+    stmt = delete(ToolComment).where(
         ToolComment.id == comment_id,
         ToolComment.tool_id == tool_id
-    ).first()
+    )
+    if user.role not in [UserRole.MODERATOR, UserRole.ADMIN]:
+        stmt = stmt.where(ToolComment.user_id == user.id)
+    
+    comment = (await db.execute(
+        stmt.returning(ToolComment.id, ToolComment.user_id)
+    )).first()
     
     if not comment:
+        # Nothing deleted: tell a missing comment apart from someone else's
+        exists = await db.scalar(select(ToolComment.id).where(
+            ToolComment.id == comment_id,
+            ToolComment.tool_id == tool_id
+        ))
+        if exists:
+            raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
         raise HTTPException(status_code=404, detail="Comment not found")
     
-    # Check permissions (owner or moderator)
-    from app.models.user import UserRole
-    if comment.user_id != user.id and user.role not in [UserRole.MODERATOR, UserRole.ADMIN]:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
-    
-    db.delete(comment)
-    db.commit()
+    await db.commit()
     
     # Clear cache
-    cache_service.clear_pattern(f"comments:{tool_id}:*")
+    cache_service.invalidate_tag(f"comments:{tool_id}")
     
     # Log action
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="delete_comment",
         entity_type="tool_comment",
@@ -379,55 +418,73 @@ async def vote_on_comment(
     comment_id: int,
     vote_data: CommentVoteCreate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Upvote or downvote a comment"""
     
-    # Check if comment exists
-    comment = db.query(ToolComment).filter(
-        ToolComment.id == comment_id,
-        ToolComment.tool_id == tool_id
-    ).first()
-    
-    if not comment:
-        raise HTTPException(status_code=404, detail="Comment not found")
+    vote_type = "upvote" if vote_data.vote == "up" else "downvote"
     
-    # Check if user already voted
-    existing_vote = db.query(CommentVote).filter(
-        CommentVote.comment_id == comment_id,
-        CommentVote.user_id == user.id
-    ).first()
-    
-    if existing_vote:
-        # Remove old vote count
-        if existing_vote.vote_type == "upvote":
-            comment.upvotes -= 1
+    # Lock the user's existing vote first so concurrent votes from the same
+    # user serialize; a first vote inserts with DO NOTHING and retries if a
+    # concurrent request inserted it first
+    for _ in range(3):
+        old_vote_type = await db.scalar(
+            select(CommentVote.vote_type)
+            .where(CommentVote.comment_id == comment_id, CommentVote.user_id == user.id)
+            .with_for_update()
+        )
+        
+        if old_vote_type is None:
+            stmt = insert(CommentVote)\
+                .values(comment_id=comment_id, user_id=user.id, vote_type=vote_type)\
+                .on_conflict_do_nothing(index_elements=[CommentVote.comment_id, CommentVote.user_id])
         else:
-            comment.downvotes -= 1
+            stmt = update(CommentVote)\
+                .where(CommentVote.comment_id == comment_id, CommentVote.user_id == user.id)\
+                .values(vote_type=vote_type)
+        
+        try:
+            written = (await db.execute(stmt.returning(CommentVote.id))).first()
+        except IntegrityError:
+            # Foreign key violation: the comment does not exist
+            await db.rollback()
+            raise HTTPException(status_code=404, detail="Comment not found")
         
-        # Update vote type
-        existing_vote.vote_type = vote_data.vote_type
+        if written is not None:
+            break
     else:
-        # Create new vote
-        existing_vote = CommentVote(
-            comment_id=comment_id,
-            user_id=user.id,
-            vote_type=vote_data.vote_type
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Vote was modified concurrently, please retry")
+    
+    # Counter deltas for the transition old vote -> new vote
+    upvote_delta = (vote_type == "upvote") - (old_vote_type == "upvote")
+    downvote_delta = (vote_type == "downvote") - (old_vote_type == "downvote")
+    
+    # Atomic counter update; also verifies the comment belongs to the tool
+    counts = (await db.execute(
+        update(ToolComment)
+        .where(ToolComment.id == comment_id, ToolComment.tool_id == tool_id)
+        .values(
+            upvotes=ToolComment.upvotes + upvote_delta,
+            downvotes=ToolComment.downvotes + downvote_delta
         )
-        db.add(existing_vote)
+        .returning(ToolComment.upvotes, ToolComment.downvotes)
+    )).first()
     
-    # Add new vote count
-    if vote_data.vote_type == "upvote":
-        comment.upvotes += 1
-    else:
-        comment.downvotes += 1
+    if not counts:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Comment not found")
     
-    db.commit()
+    await db.commit()
     
     # Clear cache
-    cache_service.clear_pattern(f"comments:{tool_id}:*")
+    cache_service.invalidate_tag(f"comments:{tool_id}")
     
-    return {"message": f"Comment {vote_data.vote_type}d successfully"}
+    return {
+        "message": f"Comment {vote_type}d successfully",
+        "upvotes": counts.upvotes,
+        "downvotes": counts.downvotes
+    }
 
 
 @router.delete("/{tool_id}/comments/{comment_id}/vote", status_code=status.HTTP_204_NO_CONTENT)
@@ -435,30 +492,35 @@ async def remove_vote(
     tool_id: int,
     comment_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Remove your vote from a comment"""
     
-    vote = db.query(CommentVote).filter(
-        CommentVote.comment_id == comment_id,
-        CommentVote.user_id == user.id
-    ).first()
+    # DELETE ... USING tool_comments: the comment must belong to the tool
+    vote = (await db.execute(
+        delete(CommentVote)
+        .where(
+            CommentVote.comment_id == comment_id,
+            CommentVote.user_id == user.id,
+            ToolComment.id == CommentVote.comment_id,
+            ToolComment.tool_id == tool_id
+        )
+        .returning(CommentVote.vote_type)
+    )).first()
     
     if not vote:
         raise HTTPException(status_code=404, detail="Vote not found")
     
-    # Get comment and update counts
-    comment = db.query(ToolComment).filter(ToolComment.id == comment_id).first()
-    if comment:
-        if vote.vote_type == "upvote":
-            comment.upvotes -= 1
-        else:
-            comment.downvotes -= 1
-    
-    db.delete(vote)
-    db.commit()
+    # Update counts atomically in the same transaction
+    counter = ToolComment.upvotes if vote.vote_type == "upvote" else ToolComment.downvotes
+    await db.execute(
+        update(ToolComment)
+        .where(ToolComment.id == comment_id)
+        .values({counter.key: counter - 1})
+    )
+    await db.commit()
     
     # Clear cache
-    cache_service.clear_pattern(f"comments:{tool_id}:*")
+    cache_service.invalidate_tag(f"comments:{tool_id}")
     
     return None
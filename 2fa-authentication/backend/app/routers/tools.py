@@ -1,27 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import bindparam, or_, func, select
+from sqlalchemy.orm import joinedload, load_only, raiseload
 from typing import List, Optional
+import hashlib
+from operator import attrgetter
+import orjson
 from app.database import get_db
 from app.models.user import User
-from app.models.tool import Tool, ToolStatus, ToolCategory
+from app.models.tool import (
+    Tool, ToolStatus, ToolCategory, TOOL_RESPONSE_COLUMNS, RATING_AGGREGATE_COLUMNS
+)
 from app.models.tool_rating import ToolRating
 from app.models.tool_comment import ToolComment
 from app.schemas.tool import (
-    ToolCreate, ToolUpdate, ToolResponse, ToolDetailResponse
+    ToolCreate, ToolUpdate, ToolResponse, ToolDetailResponse,
+    ToolWithRatingResponse, ToolSummaryResponse
 )
 from app.utils.security import get_current_user, get_current_user_optional
-from app.services.cache import cache_service
+from app.utils.pagination import encode_cursor, paginate, next_cursor
+from app.utils.aggregates import count_by
+from app.services.cache import cache_service, tool_list_tag, tool_list_tags, TOOL_STATS_KEYS
 from app.services.audit import audit_service
 
 router = APIRouter(prefix="/api/tools", tags=["Tools"])
 
+# Hot-path statements built once at import; requests only bind the values.
+# The comment count and the caller's rating are correlated subqueries, so the
+# detail view is a single round trip (user_id is NULL for anonymous callers).
+GET_TOOL_STMT = select(
+    Tool,
+    select(func.count(ToolComment.id))
+    .where(ToolComment.tool_id == Tool.id)
+    .correlate(Tool)
+    .scalar_subquery()
+    .label("total_comments"),
+    select(ToolRating.rating)
+    .where(ToolRating.tool_id == Tool.id, ToolRating.user_id == bindparam("user_id"))
+    .correlate(Tool)
+    .scalar_subquery()
+    .label("user_rating"),
+).options(
+    joinedload(Tool.creator),
+    joinedload(Tool.approver),
+    raiseload("*")
+).where(Tool.id == bindparam("tool_id"))
+
+
+# Tool attributes shared by the detail response, read in one C-level call
+_TOOL_FIELDS = tuple(ToolWithRatingResponse.model_fields)
+_get_tool_fields = attrgetter(*_TOOL_FIELDS)
+
+
+def tool_to_dict(tool: Tool) -> dict:
+    """Tool columns plus rating aggregates as a dict, ready for extra fields"""
+    return dict(zip(_TOOL_FIELDS, _get_tool_fields(tool)))
+
 
 @router.post("", response_model=ToolResponse, status_code=status.HTTP_201_CREATED)
 async def create_tool(
     tool_data: ToolCreate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new tool (requires authentication)"""
     new_tool = Tool(
@@ -33,11 +73,13 @@ async def create_tool(
         status=ToolStatus.PENDING
     )
     db.add(new_tool)
-    db.commit()
-    db.refresh(new_tool)
-    cache_service.clear_pattern("tools:*")
-    audit_service.log_action(
-        db=db,
+    await db.commit()
+    await db.refresh(new_tool)
+    cache_service.invalidate_many(
+        TOOL_STATS_KEYS,
+        tags=tool_list_tags((new_tool.category.value, new_tool.status.value))
+    )
+    audit_service.queue_action(
         user=user,
         action="create",
         entity_type="tool",
@@ -49,85 +91,76 @@ async def create_tool(
 
 @router.get("/search", response_model=List[ToolResponse])
 async def search_tools(
+    response: Response,
     q: str = Query(..., min_length=1, description="Search query"),
     category: Optional[ToolCategory] = None,
     status_filter: Optional[ToolStatus] = Query(None, alias="status"),
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Search tools by name or description"""
+    """
+    Search tools by name or description
+    
+    Pass the X-Next-Cursor header of the previous page as `cursor` to seek
+    directly to the next page instead of using `skip`.
+    """
     search_pattern = f"%{q}%"
-    query = db.query(Tool).filter(
+    query = select(Tool).where(
         or_(
             Tool.name.ilike(search_pattern),
             Tool.description.ilike(search_pattern)
         )
     )
     if category:
-        query = query.filter(Tool.category == category)
+        query = query.where(Tool.category == category)
     if status_filter:
-        query = query.filter(Tool.status == status_filter)
-    tools = query.offset(skip).limit(limit).all()
+        query = query.where(Tool.status == status_filter)
+    # Only the response columns; lazy loads would be one query per row, so
+    # fail loudly instead
+    query = query.options(load_only(*TOOL_RESPONSE_COLUMNS), raiseload("*"))
+    tools = (await db.scalars(paginate(query, Tool.created_at, Tool.id, cursor, skip, limit))).all()
+    
+    cursor_after = next_cursor(tools, limit)
+    if cursor_after:
+        response.headers["X-Next-Cursor"] = cursor_after
     return tools
 
 
 @router.get("/stats")
-async def get_tools_stats(db: Session = Depends(get_db)):
+async def get_tools_stats(db: AsyncSession = Depends(get_db)):
     """Get statistics about tools (cached)"""
     cache_key = "tools:stats"
-    cached_stats = cache_service.get(cache_key)
+    cached_stats = cache_service.get(cache_key, local=True)
     if cached_stats:
         return cached_stats
+    by_status = await count_by(db, Tool.status, ToolStatus)
     stats = {
-        "total": db.query(Tool).count(),
-        "by_status": {
-            "pending": db.query(Tool).filter(Tool.status == ToolStatus.PENDING).count(),
-            "approved": db.query(Tool).filter(Tool.status == ToolStatus.APPROVED).count(),
-            "rejected": db.query(Tool).filter(Tool.status == ToolStatus.REJECTED).count(),
-        },
-        "by_category": {}
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_category": await count_by(db, Tool.category, ToolCategory)
     }
-    for category in ToolCategory:
-        count = db.query(Tool).filter(Tool.category == category).count()
-        stats["by_category"][category.value] = count
-    cache_service.set(cache_key, stats, expire=300)
+    cache_service.set(cache_key, stats, expire=300, local=True)
     return stats
 
 
-@router.get("/my")
+@router.get("/my", response_model=List[ToolWithRatingResponse])
 async def get_my_tools(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all tools created by current user"""
-    tools = db.query(Tool).filter(Tool.created_by == user.id).order_by(Tool.created_at.desc()).all()
-    
-    tools_with_ratings = []
-    for tool in tools:
-        tool_dict = {
-            "id": tool.id,
-            "name": tool.name,
-            "description": tool.description,
-            "category": tool.category,
-            "status": tool.status,
-            "url": tool.url,
-            "created_by": tool.created_by,
-            "approved_by": tool.approved_by,
-            "rejection_reason": tool.rejection_reason,
-            "created_at": tool.created_at,
-            "updated_at": tool.updated_at,
-            "average_rating": None,
-            "total_ratings": 0
-        }
-        if tool.ratings:
-            total_ratings = len(tool.ratings)
-            sum_ratings = sum(r.rating for r in tool.ratings)
-            tool_dict["average_rating"] = round(sum_ratings / total_ratings, 2) if total_ratings > 0 else None
-            tool_dict["total_ratings"] = total_ratings
-        tools_with_ratings.append(tool_dict)
+    # Rating aggregates are kept on the tool row, no ratings are loaded
+    tools = (await db.scalars(
+        select(Tool)
+        .options(load_only(*TOOL_RESPONSE_COLUMNS, *RATING_AGGREGATE_COLUMNS), raiseload("*"))
+        .where(Tool.created_by == user.id)
+        .order_by(Tool.created_at.desc())
+    )).all()
     
-    return tools_with_ratings
+    # average_rating is a model property over the aggregate columns
+    return [ToolWithRatingResponse.model_validate(tool) for tool in tools]
 
 
 @router.get("")
@@ -137,86 +170,100 @@ async def get_tools(
     search: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get list of tools with optional filters"""
-    query = db.query(Tool)
+    """
+    Get list of tools with optional filters (cached as serialized JSON)
+    
+    Pass the `next_cursor` of the previous page as `cursor` to seek directly
+    to the next page instead of using `skip`.
+    """
+    category_key = category.value if category else "all"
+    status_key = status_filter.value if status_filter else "all"
+    search_key = hashlib.md5(search.encode()).hexdigest() if search else "all"
+    page = f"after-{cursor}" if cursor else skip
+    cache_key = f"tools:list:{category_key}:{status_key}:{search_key}:{page}:{limit}"
+    cached = cache_service.get_raw(cache_key)
+    if cached:
+        return Response(content=cached, media_type="application/json")
+    
+    query = select(Tool)
     if category:
-        query = query.filter(Tool.category == category)
+        query = query.where(Tool.category == category)
     if status_filter:
-        query = query.filter(Tool.status == status_filter)
+        query = query.where(Tool.status == status_filter)
     if search:
         search_pattern = f"%{search}%"
-        query = query.filter(
+        query = query.where(
             or_(
                 Tool.name.ilike(search_pattern),
                 Tool.description.ilike(search_pattern)
             )
         )
-    total = query.count()
-    tools = query.order_by(Tool.created_at.desc()).offset(skip).limit(limit).all()
     
-    tools_with_ratings = []
-    for tool in tools:
-        tool_dict = {
-            "id": tool.id,
-            "name": tool.name,
-            "description": tool.description,
-            "category": tool.category,
-            "status": tool.status,
-            "url": tool.url,
-            "created_by": tool.created_by,
-            "approved_by": tool.approved_by,
-            "rejection_reason": tool.rejection_reason,
-            "created_at": tool.created_at,
-            "updated_at": tool.updated_at,
-            "average_rating": None,
-            "total_ratings": 0
-        }
-        if tool.ratings:
-            total_ratings = len(tool.ratings)
-            sum_ratings = sum(r.rating for r in tool.ratings)
-            tool_dict["average_rating"] = round(sum_ratings / total_ratings, 2) if total_ratings > 0 else None
-            tool_dict["total_ratings"] = total_ratings
-        tools_with_ratings.append(tool_dict)
-    return {"tools": tools_with_ratings, "total": total}
+    # The count only depends on the filters, so it is shared by every page
+    # and dropped together with the lists of the same filter
+    filter_tag = tool_list_tag(category_key, status_key)
+    count_key = f"tools:count:{category_key}:{status_key}:{search_key}"
+    total = cache_service.get(count_key)
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        cache_service.set(count_key, total, expire=30, tags=[filter_tag])
+    
+    # Only the columns the list view shows; skips rejection_reason and the
+    # per-star rating counters. The average comes from the aggregate columns,
+    # and relationships must never be lazy loaded per row.
+    query = query.options(
+        load_only(
+            Tool.id, Tool.name, Tool.description, Tool.category, Tool.status, Tool.url,
+            Tool.created_by, Tool.approved_by, Tool.created_at, Tool.updated_at,
+            Tool.total_ratings, Tool.rating_sum
+        ),
+        raiseload("*")
+    )
+    # One extra row tells whether another page follows
+    tools = (await db.scalars(paginate(query, Tool.created_at, Tool.id, cursor, skip, limit + 1))).all()
+    has_more = len(tools) > limit
+    tools = tools[:limit]
+    
+    tools_with_ratings = [ToolSummaryResponse.model_validate(tool).model_dump() for tool in tools]
+    
+    body = orjson.dumps({
+        "tools": tools_with_ratings,
+        "total": total,
+        "has_more": has_more,
+        # limit=0 still probes one row, so has_more can be set on an empty page
+        "next_cursor": encode_cursor(tools[-1].created_at, tools[-1].id) if has_more and tools else None
+    })
+    # Registered under its filter so mutations only drop the lists they can affect
+    cache_service.set_raw(cache_key, body, expire=300, tags=[filter_tag])
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{tool_id}", response_model=ToolDetailResponse)
 async def get_tool(
     tool_id: int,
     current_user: Optional[User] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific tool by ID with extended details"""
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
-    if not tool:
+    # Creator and approver come in the same query through LEFT JOINs
+    row = (await db.execute(GET_TOOL_STMT, {
+        "tool_id": tool_id,
+        "user_id": current_user.id if current_user else None
+    })).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Tool not found"
         )
-    tool_dict = {
-        **{k: v for k, v in tool.__dict__.items() if not k.startswith('_')},
-        "created_by_username": tool.creator.username if tool.creator else None,
-        "approved_by_username": tool.approver.username if tool.approver else None,
-    }
-    if tool.ratings:
-        total_ratings = len(tool.ratings)
-        sum_ratings = sum(r.rating for r in tool.ratings)
-        tool_dict["average_rating"] = round(sum_ratings / total_ratings, 2) if total_ratings > 0 else None
-        tool_dict["total_ratings"] = total_ratings
-    else:
-        tool_dict["average_rating"] = None
-        tool_dict["total_ratings"] = 0
-    tool_dict["user_rating"] = None
-    if current_user:
-        user_rating = db.query(ToolRating).filter(
-            ToolRating.tool_id == tool_id,
-            ToolRating.user_id == current_user.id
-        ).first()
-        if user_rating:
-            tool_dict["user_rating"] = user_rating.rating
-    tool_dict["total_comments"] = db.query(ToolComment).filter(ToolComment.tool_id == tool_id).count()
+    tool = row.Tool
+    tool_dict = tool_to_dict(tool)
+    tool_dict["created_by_username"] = tool.creator.username if tool.creator else None
+    tool_dict["approved_by_username"] = tool.approver.username if tool.approver else None
+    tool_dict["user_rating"] = row.user_rating
+    tool_dict["total_comments"] = row.total_comments
     return tool_dict
 
 
@@ -225,10 +272,10 @@ async def update_tool(
     tool_id: int,
     tool_data: ToolUpdate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a tool (only creator or admin can update)"""
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
+    tool = await db.get(Tool, tool_id)
     if not tool:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -240,14 +287,17 @@ async def update_tool(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to update this tool"
         )
-    update_data = tool_data.dict(exclude_unset=True)
+    previous_filter = (tool.category.value, tool.status.value)
+    update_data = tool_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(tool, field, value)
-    db.commit()
-    db.refresh(tool)
-    cache_service.clear_pattern("tools:*")
-    audit_service.log_action(
-        db=db,
+    await db.commit()
+    await db.refresh(tool)
+    cache_service.invalidate_many(
+        TOOL_STATS_KEYS,
+        tags=tool_list_tags(previous_filter, (tool.category.value, tool.status.value))
+    )
+    audit_service.queue_action(
         user=user,
         action="update",
         entity_type="tool",
@@ -261,10 +311,10 @@ async def update_tool(
 async def delete_tool(
     tool_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a tool (only creator or admin can delete)"""
-    tool = db.query(Tool).filter(Tool.id == tool_id).first()
+    tool = await db.get(Tool, tool_id)
     if not tool:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -276,15 +326,19 @@ async def delete_tool(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to delete this tool"
         )
-    audit_service.log_action(
-        db=db,
+    audit_service.queue_action(
         user=user,
         action="delete",
         entity_type="tool",
         entity_id=tool.id,
         details={"name": tool.name}
     )
-    db.delete(tool)
-    db.commit()
-    cache_service.clear_pattern("tools:*")
+    tool_filter = (tool.category.value, tool.status.value)
+    await db.delete(tool)
+    await db.commit()
+    # Also drop the tool's own comment pages and rating stats
+    cache_service.invalidate_many(
+        [*TOOL_STATS_KEYS, f"rating:stats:{tool_id}"],
+        tags=[*tool_list_tags(tool_filter), f"comments:{tool_id}"]
+    )
     return None
\ No newline at end of file
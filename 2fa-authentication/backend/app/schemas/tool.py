@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
 from typing import Optional
 from datetime import datetime
 from app.models.tool import ToolCategory, ToolStatus
@@ -34,16 +34,37 @@ class ToolResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
-class ToolDetailResponse(ToolResponse):
+class ToolWithRatingResponse(ToolResponse):
+    """Tool response with the rating aggregates kept on the tool row"""
+    average_rating: Optional[float] = None
+    total_ratings: int = 0
+
+
+class ToolSummaryResponse(BaseModel):
+    """Compact tool entry for public lists (no rejection reason)"""
+    id: int
+    name: str
+    description: str
+    category: ToolCategory
+    status: ToolStatus
+    url: Optional[str] = None
+    created_by: int
+    approved_by: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+    average_rating: Optional[float] = None
+    total_ratings: int = 0
+    
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ToolDetailResponse(ToolWithRatingResponse):
     """Extended response with computed fields for detail views"""
     created_by_username: Optional[str] = None
     approved_by_username: Optional[str] = None
-    average_rating: Optional[float] = None
-    total_ratings: int = 0
     user_rating: Optional[int] = None  # Current user's rating
     total_comments: int = 0
 
@@ -1,65 +1,144 @@
+import asyncio
+from datetime import datetime
 from typing import Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import AsyncSessionLocal
 from app.models.audit_log import AuditLog
 from app.models.user import User
 
+# Queued audit entries are written in one INSERT per batch
+AUDIT_BATCH_SIZE = 100
+AUDIT_FLUSH_INTERVAL = 0.5  # seconds to wait for a batch to fill up
+
 
 class AuditService:
     """Service for logging user activity"""
     
-    @staticmethod
-    def log_action(
-        db: Session,
+    def __init__(self):
+        # Both are created by start(): a queue binds to the event loop that
+        # first waits on it, so it must not outlive the loop it was used in
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    def queue_action(
+        self,
         user: User,
         action: str,
         entity_type: str,
         entity_id: Optional[int] = None,
         details: Optional[Dict[str, Any]] = None
-    ) -> AuditLog:
-        """Log a user action to the audit log"""
-        audit_log = AuditLog(
-            user_id=user.id,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            details=details
-        )
-        
-        db.add(audit_log)
-        db.commit()
-        db.refresh(audit_log)
+    ) -> None:
+        """
+        Queue a user action for the audit log without blocking the request
         
-        return audit_log
+        Entries are written in batches by the background writer started with
+        start(); the timestamp is taken now, not at write time. Without a
+        running writer the entry is dropped rather than queued forever.
+        """
+        if self._worker is None or self._worker.done():
+            print(f"Audit writer not running, dropping {action} entry")
+            return
+        self._queue.put_nowait({
+            "user_id": user.id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "timestamp": datetime.utcnow()
+        })
+    
+    def start(self) -> None:
+        """Start the background writer (call once the event loop is running)"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._consume())
+    
+    async def stop(self) -> None:
+        """Flush every queued entry and stop the background writer"""
+        if self._worker is None:
+            return
+        self._queue.put_nowait(None)
+        try:
+            await self._worker
+        finally:
+            self._worker = None
+            self._queue = None
+    
+    async def _consume(self) -> None:
+        """Collect queued entries into batches and write them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            entry = await self._queue.get()
+            if entry is None:
+                return
+            
+            batch = [entry]
+            stopping = False
+            deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+            while len(batch) < AUDIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            
+            await self._write(batch)
+            if stopping:
+                return
+    
+    @staticmethod
+    async def _write(batch: list[Dict[str, Any]]) -> None:
+        """Insert a batch of audit entries in a single executemany, retrying once"""
+        for _ in range(2):
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(insert(AuditLog), batch)
+                    await db.commit()
+                return
+            except Exception as e:
+                error = e
+        print(f"Audit log write error, {len(batch)} entries lost: {error}")
     
     @staticmethod
-    def get_user_activity(
-        db: Session,
+    async def get_user_activity(
+        db: AsyncSession,
         user_id: int,
         limit: int = 50
     ) -> list[AuditLog]:
         """Get recent activity for a specific user"""
-        return db.query(AuditLog)\
-            .filter(AuditLog.user_id == user_id)\
-            .order_by(AuditLog.timestamp.desc())\
-            .limit(limit)\
-            .all()
+        result = await db.scalars(
+            select(AuditLog)
+            .where(AuditLog.user_id == user_id)
+            .order_by(AuditLog.timestamp.desc())
+            .limit(limit)
+        )
+        return list(result.all())
     
     @staticmethod
-    def get_entity_history(
-        db: Session,
+    async def get_entity_history(
+        db: AsyncSession,
         entity_type: str,
         entity_id: int,
         limit: int = 50
     ) -> list[AuditLog]:
         """Get history for a specific entity"""
-        return db.query(AuditLog)\
-            .filter(
+        result = await db.scalars(
+            select(AuditLog)
+            .where(
                 AuditLog.entity_type == entity_type,
                 AuditLog.entity_id == entity_id
-            )\
-            .order_by(AuditLog.timestamp.desc())\
-            .limit(limit)\
-            .all()
+            )
+            .order_by(AuditLog.timestamp.desc())
+            .limit(limit)
+        )
+        return list(result.all())
 
 
 # Singleton instance
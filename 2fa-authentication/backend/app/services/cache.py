@@ -1,10 +1,44 @@
 import json
-from typing import Optional, Any
+from typing import Optional, Any, Iterable, Union
 import redis
+from cachetools import TTLCache
 from app.config import get_settings
 
 settings = get_settings()
 
+# Prefix of the Redis sets used for tag-based invalidation
+TAG_PREFIX = "cache:tags:"
+
+# Cached statistics that count tools; dropped whenever a tool is added,
+# removed, or changes category or status
+TOOL_STATS_KEYS = ("tools:stats", "admin:stats:overview", "admin:statistics")
+
+
+def tool_list_tag(category: str, tool_status: str) -> str:
+    """Tag of the cached tool lists for one (category, status) filter, "all" if unset"""
+    return f"tools:filter:{category}:{tool_status}"
+
+
+def tool_list_tags(*filters: tuple[str, str]) -> list[str]:
+    """
+    Tags of the cached tool lists that can contain a tool
+    
+    Args:
+        filters: (category, status) values of the tool; pass both the old and
+            the new pair when a tool moves between them
+            
+    Returns:
+        Tags for every list filtered on the tool's category and/or status,
+        including the unfiltered lists
+    """
+    tags = {
+        tool_list_tag(category, tool_status)
+        for pair in filters
+        for category in (pair[0], "all")
+        for tool_status in (pair[1], "all")
+    }
+    return sorted(tags)
+
 
 class CacheService:
     """Service for handling Redis caching operations"""
@@ -22,15 +56,60 @@ class CacheService:
         except redis.ConnectionError:
             print("Warning: Redis connection failed. Caching will be disabled.")
             self.redis_client = None
+        # Process-local copies of hot keys; other workers are not notified of
+        # invalidations, so the TTL is kept short to bound staleness
+        self._local = TTLCache(maxsize=settings.local_cache_size, ttl=settings.local_cache_ttl)
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        """Redis set holding the keys registered under a tag"""
+        return f"{TAG_PREFIX}{tag}"
     
-    def set(self, key: str, value: Any, expire: int = 300) -> bool:
+    def set(
+        self,
+        key: str,
+        value: Any,
+        expire: int = 300,
+        local: bool = False,
+        tags: Iterable[str] = ()
+    ) -> bool:
         """
-        Set a value in cache
+        Set a value in cache and register it under the given tags
         
         Args:
             key: Cache key
             value: Value to cache (will be JSON serialized)
             expire: Expiration time in seconds (default 5 minutes)
+            local: Also keep a copy in the in-process cache
+            tags: Tags to register the key under (see invalidate_tag)
+            
+        Returns:
+            bool: True if successful
+        """
+        try:
+            serialized_value = json.dumps(value)
+        except Exception as e:
+            print(f"Cache set error: {e}")
+            return False
+        return self.set_raw(key, serialized_value, expire, local, tags)
+    
+    def set_raw(
+        self,
+        key: str,
+        payload: Union[str, bytes],
+        expire: int = 300,
+        local: bool = False,
+        tags: Iterable[str] = ()
+    ) -> bool:
+        """
+        Set an already serialized payload (e.g. a JSON response body) in cache
+        
+        Args:
+            key: Cache key
+            payload: Serialized value, stored as-is
+            expire: Expiration time in seconds (default 5 minutes)
+            local: Also keep a copy in the in-process cache
+            tags: Tags to register the key under (see invalidate_tag)
             
         Returns:
             bool: True if successful
@@ -38,35 +117,75 @@ class CacheService:
         if not self.redis_client:
             return False
         
+        if local:
+            self._local[key] = payload
+        
         try:
-            serialized_value = json.dumps(value)
-            self.redis_client.setex(key, expire, serialized_value)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(key, expire, payload)
+            # Only explicit tags: every tag set must be dropped by some
+            # invalidation path, or it would collect keys forever
+            for tag in tags:
+                tag_key = self._tag_key(tag)
+                pipe.sadd(tag_key, key)
+                # Tag sets must outlive their members, never the other way round
+                pipe.expire(tag_key, expire, gt=True)
+                pipe.expire(tag_key, expire, nx=True)
+            pipe.execute()
             return True
         except Exception as e:
             print(f"Cache set error: {e}")
             return False
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: str, local: bool = False) -> Optional[Any]:
         """
         Get a value from cache
         
         Args:
             key: Cache key
+            local: Check the in-process cache before Redis
             
         Returns:
             Cached value or None if not found
         """
+        value = self.get_raw(key, local)
+        if not value:
+            return None
+        
+        try:
+            return json.loads(value)
+        except Exception as e:
+            print(f"Cache get error: {e}")
+            return None
+    
+    def get_raw(self, key: str, local: bool = False) -> Optional[Union[str, bytes]]:
+        """
+        Get a serialized payload from cache without deserializing it
+        
+        Args:
+            key: Cache key
+            local: Check the in-process cache before Redis and keep a copy
+                of Redis hits there
+            
+        Returns:
+            Cached payload or None if not found
+        """
+        if local:
+            value = self._local.get(key)
+            if value is not None:
+                return value
+        
         if not self.redis_client:
             return None
         
         try:
             value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
-            return None
         except Exception as e:
             print(f"Cache get error: {e}")
             return None
+        if local and value:
+            self._local[key] = value
+        return value
     
     def delete(self, key: str) -> bool:
         """
@@ -78,6 +197,7 @@ class CacheService:
         Returns:
             bool: True if successful
         """
+        self._local.pop(key, None)
         if not self.redis_client:
             return False
         
@@ -92,6 +212,9 @@ class CacheService:
         """
         Clear all keys matching a pattern
         
+        Uses an incremental SCAN; prefer invalidate_tag/invalidate_many for
+        keys written with tags.
+        
         Args:
             pattern: Pattern to match (e.g., "tools:*")
             
@@ -102,14 +225,64 @@ class CacheService:
             return False
         
         try:
-            keys = self.redis_client.keys(pattern)
+            keys = list(self.redis_client.scan_iter(match=pattern, count=500))
             if keys:
                 self.redis_client.delete(*keys)
             return True
         except Exception as e:
             print(f"Cache clear pattern error: {e}")
             return False
-
+    
+    def invalidate_tag(self, tag: str) -> bool:
+        """
+        Delete every key registered under a tag (e.g., "comments:5")
+        
+        Args:
+            tag: Tag to invalidate
+            
+        Returns:
+            bool: True if successful
+        """
+        return self.invalidate_many(tags=[tag])
+    
+    def invalidate_many(self, exact_keys: Iterable[str] = (), tags: Iterable[str] = ()) -> bool:
+        """
+        Invalidate several keys and tags using pipelined round trips
+        
+        Args:
+            exact_keys: Keys to delete as-is
+            tags: Tags whose registered keys should be deleted
+            
+        Returns:
+            bool: True if successful
+        """
+        keys = list(exact_keys)
+        for key in keys:
+            self._local.pop(key, None)
+        if not self.redis_client:
+            return False
+        
+        try:
+            tag_keys = [self._tag_key(tag) for tag in tags]
+            if tag_keys:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                for members in pipe.execute():
+                    keys.extend(members)
+                    # Local copies are only made of keys read from Redis, so
+                    # the tag members cover every tagged local entry
+                    for member in members:
+                        self._local.pop(member, None)
+                keys.extend(tag_keys)
+            if keys:
+                self.redis_client.delete(*keys)
+            return True
+        except Exception as e:
+            print(f"Cache invalidate error: {e}")
+            # Tag members are unknown, don't keep possibly stale local copies
+            self._local.clear()
+            return False
 
 # Singleton instance
 cache_service = CacheService()
@@ -0,0 +1,20 @@
+from enum import Enum
+from typing import Dict, Iterable
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+async def count_by(db: AsyncSession, column, values: Iterable[Enum]) -> Dict[str, int]:
+    """
+    Count rows per value of an enum column with a single GROUP BY query
+    
+    Args:
+        db: Database session
+        column: Enum column to group on (e.g. Tool.category)
+        values: Every value to report, in output order (e.g. ToolCategory)
+        
+    Returns:
+        Counts keyed by enum value; values without rows report 0
+    """
+    counts = dict((await db.execute(select(column, func.count()).group_by(column))).all())
+    return {value.value: counts.get(value, 0) for value in values}
@@ -0,0 +1,68 @@
+import base64
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, Select, tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the (timestamp, id) position of the last row of a page"""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate(
+    query: Select,
+    timestamp: ColumnElement,
+    row_id: ColumnElement,
+    cursor: Optional[str],
+    skip: int,
+    limit: int,
+    deferred_join: bool = False
+) -> Select:
+    """
+    Order a query newest first and select one page of it
+    
+    With a cursor the query seeks past the (timestamp, id) position it encodes,
+    using the matching index instead of reading and discarding `skip` rows.
+    
+    With deferred_join, an offset page is located by skipping over ids only
+    and full rows are read for the page itself. Use it for wide rows on
+    endpoints where clients jump to arbitrary pages.
+    
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    order = (timestamp.desc(), row_id.desc())
+    if cursor:
+        return query.where(tuple_(timestamp, row_id) < decode_cursor(cursor)).order_by(*order).limit(limit)
+    if not deferred_join:
+        return query.order_by(*order).offset(skip).limit(limit)
+    
+    page_ids = query.with_only_columns(row_id).order_by(*order).offset(skip).limit(limit).subquery()
+    return query.join(page_ids, row_id == page_ids.c[row_id.key]).order_by(*order)
+
+
+def next_cursor(rows: Sequence[Any], limit: int, timestamp_attr: str = "created_at") -> Optional[str]:
+    """Cursor of the page following `rows`, or None if this was the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, timestamp_attr), last.id)
@@ -2,9 +2,10 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import get_settings
 from app.database import get_db
 from app.models.user import User
@@ -54,51 +55,51 @@ def decode_access_token(token: str) -> Optional[dict]:
         return None
 
 
+async def _resolve_user(request: Request, token: Optional[str], db: AsyncSession) -> Optional[User]:
+    """
+    Resolve the user for a JWT token once per request
+    
+    The loaded user is memoized on request.state so other auth dependencies
+    (required or optional) reuse the same instance instead of re-querying.
+    """
+    if hasattr(request.state, "user"):
+        return request.state.user
+    
+    user = None
+    payload = decode_access_token(token) if token else None
+    username = payload.get("sub") if payload else None
+    if username is not None:
+        user = await db.scalar(select(User).where(User.username == username))
+    
+    request.state.user = user
+    return user
+
+
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """Get the current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-    
-    username: str = payload.get("sub")
-    if username is None:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
+    user = await _resolve_user(request, token, db)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     return user
 
 
 async def get_current_user_optional(
+    request: Request,
     token: Optional[str] = Depends(oauth2_scheme_optional),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> Optional[User]:
     """
     Get the current authenticated user from JWT token (optional)
     Returns None if no token or invalid token
     Used for endpoints that work both authenticated and unauthenticated
     """
-    if token is None:
-        return None
-    
-    payload = decode_access_token(token)
-    if payload is None:
-        return None
-    
-    username: str = payload.get("sub")
-    if username is None:
-        return None
-    
-    user = db.query(User).filter(User.username == username).first()
-    return user
+    return await _resolve_user(request, token, db)
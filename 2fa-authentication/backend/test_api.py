@@ -51,6 +51,42 @@ def test_create_tool(token: str):
     response = requests.post(f"{BASE_URL}/api/tools", json=data, headers=headers)
     print(f"Create Tool: {response.status_code}")
     print(json.dumps(response.json(), indent=2))
+    return response.json()
+
+
+def check_rating_stats(tool_id: int, total: int, rating_sum: int, distribution: dict):
+    """Assert the rating aggregates kept on the tool"""
+    stats = requests.get(f"{BASE_URL}/api/tools/{tool_id}/ratings/stats").json()
+    assert stats["total_ratings"] == total, stats
+    assert stats["rating_distribution"] == distribution, stats
+    expected_average = round(rating_sum / total, 2) if total else 0.0
+    assert stats["average_rating"] == expected_average, stats
+    
+    tool = requests.get(f"{BASE_URL}/api/tools/{tool_id}").json()
+    assert tool["total_ratings"] == total, tool
+    assert tool["average_rating"] == (expected_average if total else None), tool
+
+
+def test_rating_aggregates(token: str, tool_id: int):
+    """Test that rating, re-rating and deleting keep the aggregates in sync"""
+    headers = {"Authorization": f"Bearer {token}"}
+    empty = {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+    
+    response = requests.post(f"{BASE_URL}/api/tools/{tool_id}/rate", json={"rating": 4}, headers=headers)
+    print(f"Rate: {response.status_code}")
+    assert response.status_code == 201, response.text
+    check_rating_stats(tool_id, total=1, rating_sum=4, distribution={**empty, "4": 1})
+    
+    response = requests.post(f"{BASE_URL}/api/tools/{tool_id}/rate", json={"rating": 2}, headers=headers)
+    print(f"Re-rate: {response.status_code}")
+    assert response.status_code == 201, response.text
+    check_rating_stats(tool_id, total=1, rating_sum=2, distribution={**empty, "2": 1})
+    
+    response = requests.delete(f"{BASE_URL}/api/tools/{tool_id}/rate", headers=headers)
+    print(f"Delete Rating: {response.status_code}")
+    assert response.status_code == 204, response.text
+    check_rating_stats(tool_id, total=0, rating_sum=0, distribution=empty)
+    print("Rating aggregates OK")
 
 
 def test_get_tools():
@@ -63,6 +99,16 @@ def test_get_tools():
         print(f"  - {tool['name']} ({tool['category']}) - {tool['status']}")
 
 
+def test_get_tools_empty_page():
+    """Test that limit=0 returns an empty page rather than an error"""
+    response = requests.get(f"{BASE_URL}/api/tools", params={"limit": 0})
+    print(f"Get Tools (limit=0): {response.status_code}")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["tools"] == [], body
+    assert body["next_cursor"] is None, body
+
+
 def test_stats():
     """Test statistics endpoint"""
     response = requests.get(f"{BASE_URL}/api/tools/stats")
@@ -100,13 +146,20 @@ if __name__ == "__main__":
             print("\n" + "=" * 50)
             print("Testing Create Tool")
             print("=" * 50)
-            test_create_tool(token)
+            tool = test_create_tool(token)
+            
+            # Test rating aggregates
+            print("\n" + "=" * 50)
+            print("Testing Rating Aggregates")
+            print("=" * 50)
+            test_rating_aggregates(token, tool["id"])
         
         # Test get tools
         print("\n" + "=" * 50)
         print("Testing Get Tools")
         print("=" * 50)
         test_get_tools()
+        test_get_tools_empty_page()
         
         # Test stats
         print("\n" + "=" * 50)
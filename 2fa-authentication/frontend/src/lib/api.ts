@@ -14,6 +14,13 @@ class ApiService {
     endpoint: string,
     options: RequestInit = {}
   ): Promise<T> {
+    return (await this.requestWithHeaders<T>(endpoint, options)).data;
+  }
+
+  private async requestWithHeaders<T>(
+    endpoint: string,
+    options: RequestInit = {}
+  ): Promise<{ data: T; headers: Headers }> {
     const token = this.getToken();
     const headers: HeadersInit = {
       'Content-Type': 'application/json',
@@ -55,9 +62,9 @@ class ApiService {
     }
 
     if (response.status === 204) {
-      return {} as T;
+      return { data: {} as T, headers: response.headers };
     }
-    return response.json();
+    return { data: await response.json(), headers: response.headers };
   }
 
   // Auth endpoints
@@ -207,7 +214,16 @@ class ApiService {
 
   // Admin endpoints
   async getPendingTools() {
-    return this.request<Tool[]>('/admin/tools/pending');
+    // The queue is served in pages; follow X-Next-Cursor so no tool is left out
+    const tools: Tool[] = [];
+    let cursor: string | null = null;
+    do {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const page: { data: Tool[]; headers: Headers } = await this.requestWithHeaders<Tool[]>(`/admin/tools/pending${query}`);
+      tools.push(...page.data);
+      cursor = page.headers.get('X-Next-Cursor');
+    } while (cursor);
+    return tools;
   }
 
   async approveTool(id: number) {